@@ -1,26 +1,69 @@
-import whisper
+import argparse
+import json
 import os
 from pathlib import Path
-from transformers import pipeline, AutoTokenizer
+import queue
 import re
-import time
 import math
-from pyannote.audio import Pipeline
-from huggingface_hub import login
-import moviepy as mv
+import subprocess
+import tempfile
+import threading
+import numpy as np
+import diarization
 import summary_action_point as sap
+from model_registry import registry
+from result_cache import cache, hash_file, hash_text, make_key
+from tracing import stage, traced
 
-tokenizer = AutoTokenizer.from_pretrained("facebook/bart-large-cnn")
-summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-action_extractor = pipeline("text2text-generation", model="google/flan-t5-base")
+SUMMARY_MODEL = "facebook/bart-large-cnn"
+ACTION_MODEL = "google/flan-t5-base"
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")  # You can also use "small" or "medium"
+# Upper bound on padded tokens per summarizer forward pass (batch size x longest chunk)
+SUMMARY_BATCH_TOKENS = int(os.getenv("SUMMARY_BATCH_TOKENS", "4096"))
+SAMPLE_RATE = 16000  # what Whisper expects
+# Audio decoded and transcribed per step in streaming mode
+STREAM_WINDOW_SECONDS = float(os.getenv("STREAM_WINDOW_SECONDS", "300"))
+# Whisper segments buffered ahead of the summarizer in streaming mode
+STREAM_QUEUE_SIZE = 256
+# "pyannote", or "embeddings" for the CPU fallback that clusters resemblyzer voice embeddings
+DIARIZATION_METHOD = os.getenv("DIARIZATION_METHOD", "pyannote")
+# Transcript chunks per flan-t5 forward pass when extracting action items
+ACTION_BATCH_SIZE = int(os.getenv("ACTION_BATCH_SIZE", "16"))
+# Cosine similarity above which two action items count as the same
+ACTION_SIMILARITY = float(os.getenv("ACTION_SIMILARITY", "0.88"))
+# Share of that similarity from whole content words rather than character n-grams, so items
+# differing in verb, owner or object stay apart even when most of their characters match
+ACTION_WORD_WEIGHT = float(os.getenv("ACTION_WORD_WEIGHT", "0.6"))
 
 
-def extract_unique_actions(text, chunk_size=500):
-    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
-    all_actions = []
+def _load_tokenizer():
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(SUMMARY_MODEL)
 
-    for chunk in chunks:
-        prompt = f"""
+
+def _load_summarizer():
+    from transformers import pipeline
+    return pipeline("summarization", model=SUMMARY_MODEL, tokenizer=registry.get("tokenizer"))
+
+
+def _load_action_extractor():
+    from transformers import pipeline
+    return pipeline("text2text-generation", model=ACTION_MODEL)
+
+
+def _load_whisper():
+    import whisper
+    return whisper.load_model(WHISPER_MODEL)
+
+
+registry.register("tokenizer", _load_tokenizer)
+registry.register("summarizer", _load_summarizer)
+registry.register("action_extractor", _load_action_extractor)
+registry.register("whisper", _load_whisper)
+
+
+def _action_prompt(chunk):
+    return f"""
         Extract UNIQUE action items from this meeting transcript.
         Format as bullets. Skip duplicates. Example:
         - John will send the report
@@ -28,13 +71,111 @@ def extract_unique_actions(text, chunk_size=500):
 
         Transcript: {chunk}
         """
-        actions = action_extractor(prompt, max_length=200)[0]['generated_text']
-        all_actions.append(actions)
 
-    # Combine and deduplicate
-    combined = "\n".join(all_actions)
-    unique_actions = list(set([a.strip() for a in combined.split("- ") if a.strip()]))
-    return "-\n- ".join([""] + unique_actions)
+
+@traced()
+def extract_action_candidates(text, chunk_size=500, segments=None):
+    """Action items generated per chunk of text, in transcript order.
+
+    All chunks go through flan-t5 in batches. Each item records the chunk it
+    came from and, when the Whisper segments are given, the start time of the
+    segment that chunk begins in.
+    """
+    starts = list(range(0, len(text), chunk_size))
+    chunks = [text[i:i + chunk_size] for i in starts]
+    prompts = [_action_prompt(chunk) for chunk in chunks]
+    # keyed on the full prompt so editing the prompt invalidates earlier results
+    keys = [make_key("actions", hash_text(prompt), ACTION_MODEL, {"max_length": 200}) for prompt in prompts]
+    outputs = [cache.get(key) for key in keys]
+    todo = [i for i, output in enumerate(outputs) if output is None]
+    if todo:
+        action_extractor = registry.get("action_extractor")
+        results = action_extractor([prompts[i] for i in todo], max_length=200,
+                                   batch_size=ACTION_BATCH_SIZE)
+        for i, result in zip(todo, results):
+            # a single-sequence result may come back wrapped in a list
+            outputs[i] = (result[0] if isinstance(result, list) else result)['generated_text']
+            cache.set(keys[i], outputs[i])
+
+    segment_starts = None
+    if segments:
+        # character offset at which each segment ends within the transcript
+        segment_ends = np.cumsum([len(s['text']) for s in segments])
+        first_segment = np.minimum(np.searchsorted(segment_ends, starts, side="right"), len(segments) - 1)
+        segment_starts = [segments[i]['start'] for i in first_segment]
+
+    candidates = []
+    for idx, output in enumerate(outputs):
+        for action in re.split(r"\n|- ", output):
+            if action.strip():
+                candidates.append({"text": action.strip(), "chunk": idx,
+                                   "start": segment_starts[idx] if segment_starts else None})
+    return candidates
+
+
+def _singular(word):
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+@traced()
+def dedupe_actions(items, threshold=ACTION_SIMILARITY, block_size=1024):
+    """Merge near-duplicate action items, keeping the earliest of each group.
+
+    Items are embedded as TF-IDF vectors of character n-grams, which absorb
+    small rewordings and typos, joined with TF-IDF vectors of their content
+    words (stop words dropped, plurals folded), which keep apart items that
+    differ in a single verb, owner or object. Anything with cosine similarity
+    of at least threshold to an earlier kept item is merged into it.
+    Similarities are computed a block of rows at a time so memory stays
+    bounded for thousands of items.
+    """
+    if len(items) < 2:
+        return [dict(item, mentions=1) for item in items]
+    from scipy.sparse import hstack
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.preprocessing import normalize
+
+    texts = [" ".join(re.sub(r"[^\w\s]", " ", item["text"].lower()).split()) for item in items]
+    chars = TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), sublinear_tf=True,
+                            dtype=np.float32).fit_transform(texts)
+    content_words = TfidfVectorizer(stop_words="english").build_analyzer()
+    try:
+        words = TfidfVectorizer(analyzer=lambda text: [_singular(w) for w in content_words(text)],
+                                sublinear_tf=True, dtype=np.float32).fit_transform(texts)
+        # both parts are L2-normalized, so dot products of the rows are the weighted cosine similarities
+        vectors = normalize(hstack([chars * np.float32(np.sqrt(1 - ACTION_WORD_WEIGHT)),
+                                    words * np.float32(np.sqrt(ACTION_WORD_WEIGHT))]).tocsr())
+    except ValueError:
+        vectors = chars  # nothing but stop words, e.g. "Okay."
+
+    n = len(items)
+    owner = np.full(n, -1)
+    for block_start in range(0, n, block_size):
+        similarities = (vectors[block_start:block_start + block_size] @ vectors.T).toarray()
+        for row, i in enumerate(range(block_start, min(n, block_start + block_size))):
+            if owner[i] >= 0:
+                continue
+            owner[i] = i
+            owner[(similarities[row] >= threshold) & (owner < 0)] = i
+
+    mentions = np.bincount(owner, minlength=n)
+    merged = []
+    for i in np.flatnonzero(owner == np.arange(n)):
+        group_starts = [items[j]["start"] for j in np.flatnonzero(owner == i) if items[j]["start"] is not None]
+        merged.append(dict(items[i], start=min(group_starts) if group_starts else items[i]["start"],
+                           mentions=int(mentions[i])))
+    return merged
+
+
+def extract_unique_actions(text, chunk_size=500, segments=None, threshold=ACTION_SIMILARITY):
+    actions = dedupe_actions(extract_action_candidates(text, chunk_size, segments), threshold)
+    lines = []
+    for action in actions:
+        timestamp = ""
+        if action["start"] is not None:
+            timestamp = f"[{int(action['start'] // 60):02d}:{int(action['start'] % 60):02d}] "
+        lines.append(f"- {timestamp}{action['text']}")
+    return "\n".join(lines)
 
 
 def save_transcript(file_path, transcript):
@@ -51,13 +192,38 @@ def read_transcript(file_path):
     with open(file_path, "r", encoding="utf-8") as f:
         return f.read()
 
-def transcribe_audio(file_path):
-    model = whisper.load_model("base")  # You can also use "small" or "medium"
-    result = model.transcribe(file_path)
-    save_transcript(file_path, result['text'])
+@traced()
+def transcribe_audio(file_path, save=True):
+    """Whisper transcript and segments of a recording; with save it is also written next to the file."""
+    key = make_key("transcribe", hash_file(file_path), WHISPER_MODEL)
+    result = cache.get_or_compute(key, lambda: registry.get("whisper").transcribe(load_audio(file_path)))
+    if save:
+        save_transcript(file_path, result['text'])
     return result['text'], result['segments']  # Segments contain timestamps
 
 
+@traced()
+def label_speakers(file_path, segments, method=DIARIZATION_METHOD, num_speakers=None):
+    """Whisper segments with a 'speaker' key added from diarizing the recording."""
+    params = {"num_speakers": num_speakers}
+    if method == "embeddings":
+        # turns follow the Whisper segment boundaries, which change with the model
+        params["segments"] = hash_text(json.dumps([[s['start'], s['end']] for s in segments]))
+    else:
+        params["model"] = diarization.PYANNOTE_MODEL
+    key = make_key("diarize", hash_file(file_path), method, params)
+
+    def diarize():
+        audio = load_audio(file_path)
+        if method == "embeddings":
+            return diarization.diarize_embeddings(audio, segments, num_speakers)
+        return diarization.diarize_pyannote(audio, num_speakers)
+
+    turns = [tuple(turn) for turn in cache.get_or_compute(key, diarize)]
+    return diarization.assign_speakers(segments, turns)
+
+
+@traced()
 def chunk_text_by_chars(text, max_chars=1024):
     sentences = re.split(r'(?<=[.?!])\s+', text)
     chunks, current_chunk = [], ""
@@ -85,34 +251,155 @@ def chunk_text_by_chars(text, max_chars=1024):
     return chunks
 
 
-def safe_summarize(text, max_len=130, min_len=30, retries=3):
-    for attempt in range(retries):
-        try:
-            summary = summarizer(text, max_length=max_len, min_length=min_len, do_sample=False)
-            return summary[0]['summary_text']
-        except Exception as e:
-            print(f"Warning: summarization failed on attempt {attempt + 1}/{retries} with error: {e}")
-            # Shorten text for retry by cutting last 20%
-            cut_len = int(len(text) * 0.8)
-            text = text[:cut_len]
-            time.sleep(1)  # small delay before retry
-    # Final fallback: return first 200 chars with ellipsis
-    return text[:200] + " ..."
-
-
-def summarize_chunks(chunks):
-    """Summarize each chunk and return a combined summary."""
-    summaries = []
-
-    for idx, chunk in enumerate(chunks):
-        print(f"Summarizing chunk {idx + 1}/{len(chunks)} (approx. {len(chunk)} characters)")
-        summary = safe_summarize(chunk)
-        summaries.append(summary)
+class TokenChunker:
+    """Incrementally split text on sentence boundaries into chunks of at most max_tokens model tokens.
+
+    Text can be fed piece by piece (e.g. Whisper segments as they finish); a chunk
+    is emitted as soon as it can no longer grow. Consecutive chunks share up to
+    overlap_tokens worth of trailing sentences so context is not lost at the cut.
+    max_tokens defaults to what the summarizer accepts once its special tokens are added.
+    """
+
+    def __init__(self, max_tokens=None, overlap_tokens=64):
+        self.tokenizer = registry.get("tokenizer")
+        if max_tokens is None:
+            max_tokens = min(self.tokenizer.model_max_length, 1024) - self.tokenizer.num_special_tokens_to_add()
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self._buffer = ""
+        self._current, self._current_len, self._fresh = [], 0, 0  # fresh = sentences not yet in any chunk
+
+    def feed(self, text):
+        """Add text and return the chunks it completed."""
+        self._buffer += text
+        parts = re.split(r'(?<=[.?!])\s+', self._buffer)
+        # the last part may be a sentence still being spoken
+        self._buffer = parts.pop()
+        return self._add_sentences(parts)
+
+    def close(self):
+        """Flush buffered text and return the remaining chunks."""
+        chunks = self._add_sentences([self._buffer])
+        self._buffer = ""
+        if self._fresh:
+            chunks.append(" ".join(s for s, _ in self._current))
+        self._current, self._current_len, self._fresh = [], 0, 0
+        return chunks
+
+    def _add_sentences(self, sentences):
+        sentences = [s.strip() for s in sentences if s.strip()]
+        if not sentences:
+            return []
+        with stage("tokenize"):
+            lengths = [len(ids) for ids in self.tokenizer(sentences, add_special_tokens=False)["input_ids"]]
+
+        chunks = []
+        for sentence, length in zip(sentences, lengths):
+            if length > self.max_tokens:
+                # split very long sentence into overlapping token windows
+                if self._fresh:
+                    chunks.append(" ".join(s for s, _ in self._current))
+                self._current, self._current_len, self._fresh = [], 0, 0
+                ids = self.tokenizer.encode(sentence, add_special_tokens=False)
+                step = self.max_tokens - self.overlap_tokens
+                for i in range(0, len(ids), step):
+                    chunks.append(self.tokenizer.decode(ids[i:i + self.max_tokens]).strip())
+                    if i + self.max_tokens >= len(ids):
+                        break
+                continue
+
+            if self._current_len + length > self.max_tokens:
+                if self._fresh:
+                    chunks.append(" ".join(s for s, _ in self._current))
+                # carry trailing sentences into the next chunk as overlap
+                tail, tail_len = [], 0
+                for prev, prev_len in reversed(self._current):
+                    if (tail_len + prev_len > self.overlap_tokens
+                            or tail_len + prev_len + length > self.max_tokens):
+                        break
+                    tail.insert(0, (prev, prev_len))
+                    tail_len += prev_len
+                self._current, self._current_len, self._fresh = tail, tail_len, 0
+
+            self._current.append((sentence, length))
+            self._current_len += length
+            self._fresh += 1
+
+        return chunks
+
+
+@traced()
+def chunk_text_by_tokens(text, max_tokens=None, overlap_tokens=64):
+    chunker = TokenChunker(max_tokens, overlap_tokens)
+    return chunker.feed(text) + chunker.close()
+
+
+def plan_batches(token_counts, max_batch_tokens):
+    """Group chunk indices into batches whose padded size stays within max_batch_tokens.
+
+    Chunks are ordered longest first so each batch pads to similar lengths.
+    """
+    order = sorted(range(len(token_counts)), key=lambda i: token_counts[i], reverse=True)
+    batches, batch = [], []
+    for i in order:
+        # the first chunk in a batch is its longest, so it sets the padded width
+        width = token_counts[batch[0]] if batch else token_counts[i]
+        if batch and width * (len(batch) + 1) > max_batch_tokens:
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _summary_key(text, max_len, min_len):
+    return make_key("summarize", hash_text(text), SUMMARY_MODEL, {"max_len": max_len, "min_len": min_len})
+
+
+@traced()
+def safe_summarize(text, max_len=130, min_len=30):
+    def summarize():
+        # truncation keeps oversized input inside the model's window instead of failing
+        summary = registry.get("summarizer")(text, max_length=max_len, min_length=min_len,
+                                             do_sample=False, truncation=True)
+        return summary[0]['summary_text']
 
+    return cache.get_or_compute(_summary_key(text, max_len, min_len), summarize)
+
+
+@traced()
+def summarize_each_chunk(chunks, max_len=130, min_len=30, max_batch_tokens=SUMMARY_BATCH_TOKENS):
+    """Summarize chunks in padded batches and return one summary per chunk, in order."""
+    keys = [_summary_key(chunk, max_len, min_len) for chunk in chunks]
+    summaries = [cache.get(key) for key in keys]
+    todo = [i for i, summary in enumerate(summaries) if summary is None]
+    if not todo:
+        return summaries
+
+    tokenizer = registry.get("tokenizer")
+    summarizer = registry.get("summarizer")
+    token_counts = [len(ids) for ids in tokenizer([chunks[i] for i in todo], add_special_tokens=False)["input_ids"]]
+    batches = plan_batches(token_counts, max_batch_tokens)
+    for idx, batch in enumerate(batches):
+        print(f"Summarizing batch {idx + 1}/{len(batches)} "
+              f"({len(batch)} chunks, up to {token_counts[batch[0]]} tokens each)")
+        results = summarizer([chunks[todo[j]] for j in batch], batch_size=len(batch), max_length=max_len,
+                             min_length=min_len, do_sample=False, truncation=True)
+        for j, result in zip(batch, results):
+            i = todo[j]
+            summaries[i] = result['summary_text']
+            cache.set(keys[i], summaries[i])
+
+    return summaries
+
+
+@traced()
+def combine_summaries(summaries):
     combined = " ".join(summaries)
 
     # Final summarization pass if still too long
-    combined_token_len = len(tokenizer.encode(combined, add_special_tokens=False))
+    combined_token_len = len(registry.get("tokenizer").encode(combined, add_special_tokens=False))
     if combined_token_len > 800:
         print("Running final summarization pass on combined summary...")
         combined = safe_summarize(combined, max_len=180, min_len=60)
@@ -120,28 +407,253 @@ def summarize_chunks(chunks):
     return combined
 
 
+def summarize_chunks(chunks, max_len=130, min_len=30, max_batch_tokens=SUMMARY_BATCH_TOKENS):
+    """Summarize chunks in padded batches and return a combined summary."""
+    return combine_summaries(summarize_each_chunk(chunks, max_len, min_len, max_batch_tokens))
+
+
 def summarize_meeting(transcript):
-    chunks = chunk_text_by_chars(transcript)
+    chunks = chunk_text_by_tokens(transcript)
     return summarize_chunks(chunks)
 
+
+def _decode_command(file_path):
+    # -vn skips decoding the video stream of video files entirely
+    return ["ffmpeg", "-nostdin", "-threads", "0", "-i", file_path, "-vn",
+            "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-loglevel", "error", "-"]
+
+
+def _pcm_to_float(data):
+    return np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+
+
+@traced()
+def load_audio(file_path):
+    """Decode an audio or video file to the 16 kHz mono float32 array Whisper consumes.
+
+    Decoding happens in memory through an ffmpeg pipe; nothing is written to disk.
+    """
+    result = subprocess.run(_decode_command(file_path), capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to decode audio from {file_path}: {result.stderr.decode(errors='replace')}")
+    return _pcm_to_float(result.stdout)
+
+
+def stream_audio_windows(file_path, window_seconds=STREAM_WINDOW_SECONDS):
+    """Decode an audio or video file like load_audio, yielding it window by window."""
+    window_bytes = int(window_seconds * SAMPLE_RATE) * 2  # s16le samples
+    # stderr goes to a file: a pipe we only read at the end could fill up and stall ffmpeg
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(_decode_command(file_path), stdout=subprocess.PIPE, stderr=stderr)
+        finished = False
+        try:
+            while True:
+                data = process.stdout.read(window_bytes)
+                if not data:
+                    finished = True
+                    break
+                yield _pcm_to_float(data)
+        finally:
+            process.stdout.close()
+            if not finished:
+                # consumer stopped early
+                process.kill()
+            if process.wait() != 0 and finished:
+                stderr.seek(0)
+                raise RuntimeError(f"Failed to decode audio from {file_path}: "
+                                   f"{stderr.read().decode(errors='replace')}")
+
+
+def transcribe_stream(file_path, window_seconds=STREAM_WINDOW_SECONDS):
+    """Transcribe audio window by window, yielding Whisper segments as they finish.
+
+    Segment times are relative to the start of the file. The last segment of
+    each window is held back and re-transcribed with the next window so words
+    are not cut at window boundaries.
+    """
+    key = make_key("transcribe_stream", hash_file(file_path), WHISPER_MODEL, {"window_seconds": window_seconds})
+    cached = cache.get(key)
+    if cached is not None:
+        yield from cached
+        return
+
+    segments = []
+    windows = _transcribe_windows(file_path, window_seconds)
+    try:
+        for segment in windows:
+            segments.append(segment)
+            yield segment
+    finally:
+        windows.close()
+    cache.set(key, segments)
+
+
+def _transcribe_windows(file_path, window_seconds):
+    model = registry.get("whisper")
+    windows = stream_audio_windows(file_path, window_seconds)
+    carry = np.zeros(0, dtype=np.float32)
+    offset, prompt, segment_id = 0.0, None, 0
+
+    try:
+        window = next(windows, None)
+        while window is not None:
+            next_window = next(windows, None)
+            audio = np.concatenate([carry, window])
+            result = model.transcribe(audio, initial_prompt=prompt)
+            segments = result['segments']
+
+            if next_window is not None and len(segments) > 1:
+                cut = segments[-1]['start']
+                segments = segments[:-1]
+                carry = audio[int(cut * SAMPLE_RATE):]
+            else:
+                cut = len(audio) / SAMPLE_RATE
+                carry = np.zeros(0, dtype=np.float32)
+
+            for segment in segments:
+                segment = dict(segment, id=segment_id,
+                               start=segment['start'] + offset, end=segment['end'] + offset)
+                segment_id += 1
+                yield segment
+
+            if segments:
+                prompt = "".join(s['text'] for s in segments)[-200:]
+            offset += cut
+            window = next_window
+    finally:
+        # stops ffmpeg if we were closed early
+        windows.close()
+
+
+def _in_background(iterable, maxsize=STREAM_QUEUE_SIZE):
+    """Run an iterator in a worker thread so its consumer can work while it produces.
+
+    If the consumer stops early or raises, the producer stops after its
+    current item and the source iterator is closed.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    done = object()
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(e)
+            return
+        finally:
+            # generators must be closed from the thread that runs them
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+        put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+@traced()
+def stream_meeting(file_path, window_seconds=STREAM_WINDOW_SECONDS, on_summary=None, action_items=None):
+    """Transcribe and summarize a recording as it is decoded.
+
+    Whisper runs in a background thread while completed text is chunked and
+    summarized, so the first chunk summaries are ready long before the
+    recording has been fully transcribed. If action_items is given (a
+    sap.ActionItemStream) the text is also fed to it as it arrives; the caller
+    closes it for the merged action points. Returns the streamed transcript,
+    its segments and a summary equal to summarize_meeting on that transcript.
+    Windowed transcription can differ slightly from transcribe_audio's at
+    window boundaries.
+    """
+    chunker = TokenChunker()
+    # summarize once there are enough full-size chunks to fill a batch
+    batch_size = max(1, SUMMARY_BATCH_TOKENS // chunker.max_tokens)
+    segments, pending, summaries = [], [], []
+
+    def summarize_pending():
+        for summary in summarize_each_chunk(pending):
+            if on_summary:
+                on_summary(len(summaries), summary)
+            summaries.append(summary)
+        pending.clear()
+
+    for segment in _in_background(transcribe_stream(file_path, window_seconds)):
+        segments.append(segment)
+        pending.extend(chunker.feed(segment['text']))
+        if action_items is not None:
+            action_items.feed(segment['text'])
+        if len(pending) >= batch_size:
+            summarize_pending()
+
+    pending.extend(chunker.close())
+    summarize_pending()
+
+    transcript = "".join(s['text'] for s in segments)
+    save_transcript(file_path, transcript)
+    return transcript, segments, combine_summaries(summaries)
+
 def video_to_audio(path):
+    """Write the audio track of a video to an .mp3 next to it and return its path.
+
+    Only needed when an audio file is wanted: transcribe_audio, label_speakers
+    and stream_meeting decode video paths directly, with no intermediate file.
+    """
     base_name = os.path.splitext(os.path.basename(path))[0]
     directory = os.path.dirname(path)
     output_path = os.path.join(directory, f"{base_name}.mp3")
 
-    # Load video and extract audio
-    video = mv.VideoFileClip(path)
-    video.audio.write_audiofile(output_path)
+    result = subprocess.run(["ffmpeg", "-nostdin", "-y", "-i", path, "-vn", "-loglevel", "error", output_path],
+                            capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to extract audio from {path}: {result.stderr.decode(errors='replace')}")
 
     return output_path
+
 if __name__ == "__main__":
     project_root = Path(__file__).parent.parent
-    audio_path = project_root / 'test' / 'meeting-2.mp3'
+    parser = argparse.ArgumentParser(description="Transcribe a meeting and extract action points")
+    parser.add_argument("audio", nargs="?", default=str(project_root / 'test' / 'meeting-2.mp3'))
+    parser.add_argument("--stream", action="store_true",
+                        help="summarize while transcribing instead of after")
+    parser.add_argument("--speakers", action="store_true",
+                        help="label the transcript by speaker before extracting action points")
+    args = parser.parse_args()
+    audio_path = Path(args.audio)
 
     if not audio_path.exists():
         raise FileNotFoundError(f"Audio file not found at: {audio_path}")
     # transcript = "I'll start again. This is the meeting for the Armour Springfield special meeting to discuss our 2025 financial plan. Today's date is April 29th at 2025 and the time is exactly 6 p.m. I'm Mayor Patrick Terriam for the Armour Springfield. All council is present to my right. The sending order is a Glen Fuel, Andy Kaczynski, Mark Miller and Melinda Warren. If I can get a adoption of the agenda there, move on to seconder please. Melinda and Glen, in addition to council at all. I see none. If I can get a mover or those in support of the adoption of the agenda. Andy, that would be unanimous and is there for or past. We'll get into 4.1 that's adoption of the 2025 financial plan. Can they get a mover and a seconder for that as well please. Melinda and Patrick. I'm going to ask all the council of the Armour Springfield to adopt the 2025 financial plan consisting of one and operating budget to a capital budget. Three and estimate of operating revenue and expenditures for the following fiscal year and four a five year capital expenditure program. Thank you. Questions. Councillor Miller. No, this same. No, we can't hear. I'm sorry. I'm sorry. I'm sorry. I'm sorry. Sorry about that. Just a couple of comments and questions. First one to the CEO or CFO. Under section 3.304 subsection one. No later than May 15th of each year. Thank you. I assume that in the next coming meetings we're going to have a bylaw to adopt the financial plan. Thank you for that clarity. A few concerns I have. I wanted to share with council with this particular proposed 2025 financial plan. I think that's a good question. I think that's a good question. At least one resident got back to me. Actually there's a couple of them a few that had input questions to our council. But as you know, we don't have question period. We don't have delegations and we really have no mechanism for the public to engage with us. But this one individual as you know, it's in our agenda kind of hidden from the public. So I'm just wondering when people submit comments. Because again, we've eliminated question period. We don't really have delegations to this special meeting. So there's no opportunity for the public to engage with us at all. But yet this individual took the effort to do I think a two or three page. Exposition or series of questions for the financial plan. But yet when they submitted them online, this individual had the understanding that they would be posted publicly for people to share his concerns or maybe even respond to them. But I think you know who I'm referring to. I'm not sure if that individual wants me to say that their name. But I'm just wondering when people submit comments. Wasn't that supposed to be the mechanism where the public still has the opportunity to publicly have their concerns shared with the community. In other words, are we just now relying on bank rant and rave for the community to engage with us. This seems to be really the only mechanism. I'm kind of frustrated at that because people are now calling me and saying, Mark, other than you expressing our concerns at these meetings, there's no ability for the public to engage with not only the bureaucracy, but with council in general. And so for some council members, they feel it's gone on deaf ears. In other words, they share those concerns with council representatives, but they don't bring them up. They don't share them and they don't respond to them. And so they feel very frustrated. They feel that the only mechanism now, the only mechanism they have now are two things. One to institute recall legislation, which of course won't happen very quickly. And the second is to vote differently at the next election in October of 2026. So it's unfortunate we've come to this situation where the public really is relegated to the back woods. And so my next point is with the provincial reassessment this year in 2025. We have an addition of $2 million to our kitty. And so we've taken upon us to find ways to spend that $2 million. And you know, I came to council here wanting to sharpen my pencil as much as I could not to cut indiscriminately, but to save taxpayers dollars on discretionary items. In other words, things that are not necessarily for the clear benefit of the ratepayers of our community. And I've tried to do that, but like in any democracy, if they don't flow with the rest of those who vote for those things, they end up in the dungeon and don't get passed. So I would suggest that you know, with this proposed budget, I personally have seen that I'm going to have an 18% increase in my municipal taxes, 18%. And I don't have the biggest house in our municipality. I guarantee you that. My neighbor across the street has a house worth at least five times mine. And they're going to go ballistic if their rate increases 18%. Now, I know that's not the average, but some people are going to have 20% some are going to have 2% some are going to have 8% to they're going to wonder and ask us the question, where are we spending this money? Why is we got $2 million extra because of the reassessment, but yet we're spending that like. I want to be cautious when I say, but we're spending it just because we have it. And so we've got some very important and critical projects coming forward as we all know. And we have to address those. So I would like our council to set a goal of reducing expenditures going forward, not increasing them just because we have a. Our, an influx of $2 million because next year we're not going to have that $2 million extra kitty. And if our expenses keep rising the way they are, you know, people are stretched to the limit. We saw it in the election yesterday affordability and cost of living is the top priority for all political parties, whether they really address it or not. That's another issue, but we have to on the grassroots here in the municipality realize that people don't have an endless credit card to spend money with. I'm not going to go on a rant here, but anyway you kind of get the, the just of where I'm going. Thank you. Thank you, council Miller. I just want to remind people in the audience that there's no recording allowed. I'll be able to understand that. Thank you. Any other questions from council? Council Kazinsky. Yeah, thank you. I would like to point out council a matter that it's not $2 million, but it's $3.2 million. We're going to receive from that 18% increase by reassessment of houses. 3.3, councilor Kazinsky. 3.3. Okay, that even all that even better yet. So I will echo your comments and you concerned that, you know, we have to be really, you know, frugal with our money right now. So because not going to happen all the time that we're going to get that reassessment because province have to, you know, realize that people only have so much money to spend. And the gravy train going to be over shortly. So that's my concern and my input. Thank you. Thank you very much, councilor Kazinsky. Any other questions for come or comments from council? I just like to kind of clarify or summarize everything that as the chair allows me this opportunity to do so. The mechanisms for this budget were totally complied with there. We did have our planning hearing or the public hearing here last week, I believe. There and all the questions were answered. I know who you were talking to and I don't know whether you mentioned his name or not. I'm not sure whether I can or not, but I won't. And those questions were answered by me through on the record there. So they're like, I think they were referred to as flags or something like that. So I answered all those questions there. And it was the questions were answered by or the answers were provided by administration. That weren't answered at the time of the hearing itself there. So I do understand the. The situation that both councils were talking about is Kazinsky Miller and we I totally understand the you know, I don't know that. And our Amazon is a strong position as ourselves. We have very good. Financial position there and it shows in the progress the steps that we're taking, but we don't take it furiously. We went through each one of these as you know, through our committee of a holes and worker groups there. We went detail by detail line by line and saved where we can. And you know, the wants as opposed to needs were all we were all they're all weighed. And so we rely quite heavily on our other directors for their budgets. We give them something at the beginning of the year. And for the everybody does the exceptional job with that with that money and they know it's a taxpayers money. It's most of them are the taxpayers within the armors, make for themselves. So the increase as councilor Miller, it's as stated, they forget what councilor Miller was saying for his increase there, whether you said it or not, I'm not sure. But mine went up 21% of course I'm going to be paying a price for that. My neighbors, we've had discussions about that. And you know, unfortunately, that's out of our control with the assessment year being this year. Yes, we got a pretty good amount of money. We got a pretty good amount of money two years ago. I think we got 2.2 million two years ago. Things change and so on like that. So we we we're able to reduce our excuse me or mill rate by 3.1 per six. So it's not going to help a lot of the taxpayers there and that's on average a 17% increase within the armors, Springfield. Some, you know, might even pay a little bit less there, but it's going as high as 21% in that that would be myself and my neighbors around me there. I do understand the concerns from councilors Miller, Kaczynski there. And just to reiterate there, everybody does have an input into the into this the budget and that was expressed quite eloquently by several people there that came up to us last week. As well as time goes on there, everybody has a chance to discuss this through delegations and questions through their counselors. Myself and I answer every every questionnaire, but that's all I have to say to summarize all that any other questions from council at all. The pretty mayor. Yeah, I just like to say that we did a really good job in working through this budget and we will, like I said, I said it time before that we went through this budget went and reduced the mill rate once went back the second time and even became lower the second time. And again, all administration put their hearts into this to make it work and I agree that all administration and staff that are involved in the budget take it seriously with every resident's dollar and they do the best they can and costs are going up wherever we look. And we know that and we're doing the best we can. And we're going to be able to do a budget to me is a good budget and we got a plan for the future and that's what we're doing because these costs and everything is not going down to keep going up. Thank you. Thank you, Mr. Mayor, it's good we have a council because we have different voice of you. I wouldn't necessarily agree with the deputy mayor in this particular situation. I think we can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. We can do better. The 9s. The 9s. I think there is improvement to make. I cannot support this budget proposed as it is. I think we can use the excuse that people had an opportunity for a public open house. Thank you, Councillor. Does any other questions? I see none. We can read the resolution. We can vote on it. Yes, please. Here is all the counsel of the arm. Springfield adopted the 2025 financial plan consisting of one and operating budget to a capital budget three and estimate of operating revenue and expenditures for the following fiscal year and for a five year capital expenditure program. With the show hands first of those in support. That will be Councillor Warren, the premier. Fuel and the mayor, Terrin, those opposed. Counselors Miller and Kazinsky, the sole past. Unless there's any other questions from council. I see none. Then proposed to adjourn. Can I move on to second or two adjourn? Councillor Melinda and the mayor and the mayor. Fuel and at 617 p.m. The meeting is adjourned. Thank you very much, people for attending in the audience and online and the council. Thank you very much."
-    transcript, segments = transcribe_audio(str(audio_path))
+    action_stream = None
+    if args.stream:
+        # speaker labels need the whole recording, so action points can only stream without them
+        action_stream = None if args.speakers else sap.ActionItemStream()
+        transcript, segments, summary = stream_meeting(
+            str(audio_path), on_summary=lambda idx, text: print(f"Chunk {idx + 1} summary: {text}"),
+            action_items=action_stream)
+        print("Summary:\n", summary)
+    else:
+        transcript, segments = transcribe_audio(str(audio_path))
     # print("Transcript:\n", transcript)
 
     # actions = extract_unique_actions(
@@ -151,5 +663,11 @@ if __name__ == "__main__":
     #     )
     # print("Summary:\n", summary)
     # print("Segments:\n", segments)
-    summary_actions = sap.get_action_items(transcript)
+    if args.speakers:
+        segments = label_speakers(str(audio_path), segments)
+        transcript = diarization.format_speaker_transcript(segments)
+    if action_stream is not None:
+        summary_actions = action_stream.close()
+    else:
+        summary_actions = sap.get_action_items_map_reduce(transcript, speaker_labeled=args.speakers)
     print(summary_actions)
@@ -0,0 +1,233 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from result_cache import hash_text
+
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".flac", ".ogg", ".aac", ".wma"}
+VIDEO_EXTENSIONS = {".mp4", ".mkv", ".mov", ".avi", ".webm", ".m4v"}
+
+# Set in each worker process by _init_worker
+_app = None
+
+
+def find_recordings(source):
+    """Recordings under a directory, or listed one per line in a manifest file."""
+    source = Path(source)
+    if source.is_dir():
+        return sorted(p for p in source.rglob("*")
+                      if p.suffix.lower() in AUDIO_EXTENSIONS | VIDEO_EXTENSIONS)
+    recordings = []
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                path = Path(line)
+                recordings.append(path if path.is_absolute() else source.parent / path)
+    return recordings
+
+
+def load_progress(progress_path):
+    """Latest recorded result per file from a previous run."""
+    done = {}
+    if progress_path.exists():
+        with open(progress_path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    done[record["file"]] = record
+                except (ValueError, KeyError, TypeError):
+                    # e.g. the last line of a run that was killed mid-write
+                    print(f"Warning: skipping unreadable line {number} of {progress_path}")
+    return done
+
+
+def _init_worker(threads, requests_per_minute):
+    # thread pools are sized when torch is first imported, so set the limits before that
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    # each worker rate-limits on its own, so it gets its share of the total
+    os.environ["OPENAI_REQUESTS_PER_MINUTE"] = str(requests_per_minute)
+    global _app
+    import app
+    _app = app
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    app.registry.warm("whisper", "tokenizer", "summarizer")
+
+
+def process_recording(path, output_path, actions=True):
+    """Run the full pipeline on one recording and write its results as JSON."""
+    start = time.perf_counter()
+    try:
+        # video files are decoded straight to audio in memory, no intermediate .mp3; the
+        # transcript goes in the JSON output, not next to a recording on a possibly read-only mount
+        transcript, segments = _app.transcribe_audio(path, save=False)
+        summary = _app.summarize_meeting(transcript)
+        action_items = _app.sap.get_action_items_map_reduce(transcript) if actions else None
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump({"file": path, "transcript": transcript, "segments": segments,
+                       "summary": summary, "action_items": action_items}, f, default=str)
+        return {"file": path, "status": "ok", "output": output_path,
+                "audio_seconds": segments[-1]["end"] if segments else 0.0,
+                "seconds": round(time.perf_counter() - start, 2)}
+    except Exception as e:
+        return {"file": path, "status": "failed", "error": f"{type(e).__name__}: {e}",
+                "traceback": traceback.format_exc(), "seconds": round(time.perf_counter() - start, 2)}
+
+
+def output_path_for(recording, source, output_dir):
+    """Where a recording's results go, mirroring its path under the source directory.
+
+    The recording's own suffix is kept (meet.mp4 -> meet.mp4.json) so an audio
+    file and a video of the same name do not share a result. Recordings outside
+    the source directory, e.g. from a manifest, are named after a hash of
+    their full path.
+    """
+    source = Path(source)
+    root = source if source.is_dir() else source.parent
+    recording = recording.resolve()
+    try:
+        relative = recording.relative_to(root.resolve())
+    except ValueError:
+        relative = Path(f"{hash_text(str(recording))[:12]}-{recording.name}")
+    return str(Path(output_dir) / relative.with_name(relative.name + ".json"))
+
+
+def _process_all(recordings, outputs, workers, threads_per_worker, requests_per_minute, actions):
+    """Yield a result record per recording, surviving worker crashes.
+
+    At most `workers` recordings are in flight at once. When a worker dies
+    (e.g. killed for running out of memory) the pool breaks and every
+    in-flight recording loses its result, so the pool is rebuilt and those
+    recordings are retried one at a time: only the one that crashes on its
+    own is marked failed.
+    """
+    context = multiprocessing.get_context("spawn")
+    queue, suspects = deque(recordings), deque()
+    while queue or suspects:
+        isolate = bool(suspects)
+        pending = suspects if isolate else queue
+        limit = 1 if isolate else workers
+        with ProcessPoolExecutor(max_workers=limit, mp_context=context, initializer=_init_worker,
+                                 initargs=(threads_per_worker, requests_per_minute / workers)) as pool:
+            running, broken = {}, False
+            while (pending or running) and not broken:
+                while pending and len(running) < limit:
+                    r = pending.popleft()
+                    running[pool.submit(process_recording, str(r), outputs[r], actions)] = r
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    r = running.pop(future)
+                    try:
+                        yield future.result()
+                    except BrokenProcessPool as e:
+                        broken = True
+                        if isolate:
+                            yield {"file": str(r), "status": "failed", "error": f"worker process died: {e}"}
+                        else:
+                            suspects.append(r)
+                    except Exception as e:
+                        yield {"file": str(r), "status": "failed", "error": f"{type(e).__name__}: {e}"}
+            # recordings that were in flight alongside the crash are retried
+            for future, r in running.items():
+                if future.done() and not future.exception():
+                    yield future.result()
+                else:
+                    suspects.append(r)
+
+
+def run_batch(source, output_dir, workers, threads_per_worker, requests_per_minute, actions=True):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    progress_path = output_dir / "progress.jsonl"
+
+    # keyed on absolute paths so a resumed run from another directory or manifest still matches
+    recordings = list(dict.fromkeys(r.resolve() for r in find_recordings(source)))
+    done = {str(Path(f).resolve()) for f, record in load_progress(progress_path).items() if record["status"] == "ok"}
+    todo = [r for r in recordings if str(r) not in done]
+
+    outputs = {r: output_path_for(r, source, output_dir) for r in recordings}
+    by_output = {}
+    for r, output in outputs.items():
+        by_output.setdefault(output, []).append(str(r))
+    clashes = [files for files in by_output.values() if len(files) > 1]
+    if clashes:
+        raise ValueError(f"Recordings would overwrite each other's results: {clashes}")
+    print(f"{len(recordings)} recordings found, {len(recordings) - len(todo)} already done, {len(todo)} to process")
+
+    results = []
+    start = time.perf_counter()
+    truncated = False
+    if progress_path.exists() and progress_path.stat().st_size:
+        with open(progress_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            truncated = f.read(1) != b"\n"
+    with open(progress_path, "a", encoding="utf-8") as progress:
+        if truncated:
+            # the last run was killed mid-write; start a fresh line
+            progress.write("\n")
+        for record in _process_all(todo, outputs, workers, threads_per_worker, requests_per_minute, actions):
+            progress.write(json.dumps(record) + "\n")
+            progress.flush()
+            results.append(record)
+            print(f"[{len(results)}/{len(todo)}] {record['status']}: {record['file']}"
+                  + (f" ({record['error']})" if record["status"] == "failed" else ""))
+
+    wall_seconds = time.perf_counter() - start
+    report = build_report(results, wall_seconds, workers, threads_per_worker)
+    with open(output_dir / "report.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def build_report(results, wall_seconds, workers, threads_per_worker):
+    succeeded = [r for r in results if r["status"] == "ok"]
+    audio_minutes = sum(r["audio_seconds"] for r in succeeded) / 60
+    wall_minutes = wall_seconds / 60
+    return {
+        "processed": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "failed_files": [r["file"] for r in results if r["status"] != "ok"],
+        "workers": workers,
+        "threads_per_worker": threads_per_worker,
+        "audio_minutes": round(audio_minutes, 2),
+        "wall_minutes": round(wall_minutes, 2),
+        "audio_minutes_per_wall_minute": round(audio_minutes / wall_minutes, 2) if wall_minutes else None,
+    }
+
+
+if __name__ == "__main__":
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Transcribe, summarize and extract actions for many recordings")
+    parser.add_argument("source", help="directory of recordings, or a manifest file with one path per line")
+    parser.add_argument("--output-dir", default="batch_output",
+                        help="where results, progress.jsonl and report.json are written")
+    parser.add_argument("--workers", type=int, default=max(1, cpus // 4))
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="CPU threads per worker (default: cores divided by workers)")
+    parser.add_argument("--requests-per-minute", type=float,
+                        default=float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "60")),
+                        help="OpenAI requests per minute across all workers, split evenly between them")
+    parser.add_argument("--no-actions", action="store_true", help="skip LLM action point extraction")
+    args = parser.parse_args()
+
+    threads = args.threads_per_worker or max(1, cpus // args.workers)
+    report = run_batch(args.source, args.output_dir, args.workers, threads, args.requests_per_minute,
+                       actions=not args.no_actions)
+    print(json.dumps(report, indent=2))
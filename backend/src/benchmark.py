@@ -0,0 +1,303 @@
+"""Per-stage benchmark of the meeting pipeline.
+
+Runs each stage on backend/test/meeting-2_transcript.txt and on synthetic
+transcripts of increasing size, and prints machine-readable JSON with the
+wall time and peak memory of every stage so runs can be compared across
+commits. Peak memory is reported twice: Python allocations from tracemalloc,
+and resident set size sampled from /proc, which also covers torch and other
+native allocations:
+
+    python benchmark.py --output bench.json
+
+By default the models are small deterministic stand-ins, so it runs offline
+on CPU in seconds; --models real loads the actual Hugging Face models
+instead. The OpenAI clients, sync and async, are always stubbed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+from types import SimpleNamespace
+
+# the OpenAI client is swapped for a stub before use; a key is only needed to import
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import app
+import summary_action_point as sap
+from model_registry import _rss_bytes, registry
+from result_cache import cache
+
+TRANSCRIPT_PATH = Path(__file__).parent.parent / 'test' / 'meeting-2_transcript.txt'
+SYNTHETIC_SIZES = (50_000, 200_000, 800_000)  # characters
+
+
+class StubTokenizer:
+    """Word-level tokenizer with the parts of the Hugging Face interface the pipeline uses."""
+
+    model_max_length = 1024
+
+    def __init__(self):
+        self._vocab = {}
+        self._words = []
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def encode(self, text, add_special_tokens=True):
+        ids = []
+        for word in re.findall(r"\w+|[^\w\s]", text):
+            if word not in self._vocab:
+                self._vocab[word] = len(self._words)
+                self._words.append(word)
+            ids.append(self._vocab[word])
+        return [0] + ids + [0] if add_special_tokens else ids
+
+    def decode(self, ids):
+        return " ".join(self._words[i] for i in ids)
+
+    def __call__(self, texts, add_special_tokens=True):
+        return {"input_ids": [self.encode(text, add_special_tokens) for text in texts]}
+
+
+def stub_summarizer(texts, max_length=130, **kwargs):
+    """Leading sentences of each text, up to max_length words."""
+    single = isinstance(texts, str)
+    results = []
+    for text in [texts] if single else texts:
+        words = text.split()[:max_length]
+        results.append({"summary_text": " ".join(words)})
+    return results
+
+
+def _commitments(text):
+    return [s.strip() for s in re.split(r"(?<=[.?!])\s+", text)
+            if re.search(r"\b(will|need to|going to|must|should)\b", s, re.I)]
+
+
+def stub_action_extractor(prompts, **kwargs):
+    """Sentences that sound like commitments, as bullets."""
+    single = isinstance(prompts, str)
+    results = []
+    for prompt in [prompts] if single else prompts:
+        actions = _commitments(prompt.rsplit("Transcript:", 1)[-1])
+        results.append([{"generated_text": "\n".join(f"- {a}" for a in actions)}])
+    return results
+
+
+def _completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class StubCompletions:
+    def create(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        return _completion("- " + "\n- ".join(prompt.split(". ")[:5]))
+
+
+class StubAsyncCompletions:
+    """Map requests get the piece's commitments as JSON action items, reduce requests a short summary."""
+
+    async def create(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        await asyncio.sleep(0)
+        if kwargs.get("response_format"):
+            transcript = prompt.split('"""')[1]
+            return _completion(json.dumps({
+                "summary": " ".join(transcript.split()[:50]),
+                "action_items": [{"task": a, "owner": None, "due": None} for a in _commitments(transcript)]}))
+        return _completion(" ".join(prompt.split()[:130]))
+
+
+class StubAsyncOpenAI:
+    def __init__(self, **kwargs):
+        self.chat = SimpleNamespace(completions=StubAsyncCompletions())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+def use_stub_models():
+    registry.register("tokenizer", StubTokenizer)
+    registry.register("summarizer", lambda: stub_summarizer)
+    registry.register("action_extractor", lambda: stub_action_extractor)
+
+
+NAMES = ("Mark", "Sarah", "Dave", "Priya", "Tom", "Elena", "Kwame", "Lucy", "Raj", "Hannah", "Omar", "Grace")
+VERBS = ("send", "review", "update", "draft", "schedule", "approve", "circulate", "finalize", "check",
+         "prepare", "present", "file", "audit", "share", "revise")
+OBJECTS = ("the budget report", "the tax levy figures", "the road repair quote", "the staffing plan",
+           "the park proposal", "the water main estimate", "the audit findings", "the meeting minutes",
+           "the insurance renewal", "the grant application", "the snow removal contract", "the pension forecast",
+           "the library hours", "the zoning request", "the fire hall invoice", "the capital plan",
+           "the payroll summary", "the bylaw draft", "the drainage study", "the council agenda")
+DATES = ("by Friday", "next week", "before the next meeting", "by May 15th", "by the end of the month",
+         "tomorrow", "by June 1st", "this quarter", "before the budget vote", "by Monday")
+COMMITMENTS = ("{name} will {verb} {object} {date}.", "{name} is going to {verb} {object} {date}.",
+               "We need to {verb} {object} {date}.", "{name} should {verb} {object} {date}.")
+REMARKS = ("{name} said {object} looked fine last year.", "Thanks, {name}.", "Any questions on {object}?",
+           "{name} asked how {object} compares to the plan.", "Okay, moving on.",
+           "{name} mentioned {object} came up at the last meeting.")
+
+
+def synthetic_transcript(size, seed=0):
+    """A transcript of about size characters of generated remarks and commitments.
+
+    Commitments are drawn from thousands of name/verb/object/date combinations,
+    some in several phrasings, so action deduplication sees many distinct and
+    near-duplicate candidates as the transcript grows.
+    """
+    rng = random.Random(seed)
+    parts, length = [], 0
+    while length < size:
+        template = rng.choice(COMMITMENTS if rng.random() < 0.3 else REMARKS)
+        sentence = template.format(name=rng.choice(NAMES), verb=rng.choice(VERBS),
+                                   object=rng.choice(OBJECTS), date=rng.choice(DATES))
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)
+
+
+class RssSampler:
+    """Context manager that samples the process RSS in a background thread and keeps the peak.
+
+    peak and start stay None where /proc is unavailable.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start = self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        rss = _rss_bytes()
+        if rss is not None:
+            self.peak = rss if self.peak is None else max(self.peak, rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self.start = self.peak = _rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+
+def measure(func, repeat):
+    """Wall time and peak RSS of each run, and the peak traced Python memory of one more run."""
+    timings, rss_peak, rss_growth = [], None, None
+    for _ in range(repeat):
+        with RssSampler() as rss:
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        if rss.peak is not None:
+            rss_peak = max(rss_peak or 0, rss.peak)
+            rss_growth = max(rss_growth or 0, rss.peak - rss.start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # the RSS growth is what the stage itself added on top of what was already resident
+    return {"seconds_min": round(min(timings), 6), "seconds_median": round(statistics.median(timings), 6),
+            "peak_python_bytes": peak, "peak_rss_bytes": rss_peak, "peak_rss_growth_bytes": rss_growth}
+
+
+def pipeline_stages(text):
+    sentences = [s for s in re.split(r'(?<=[.?!])\s+', text) if s.strip()]
+    chunks = app.chunk_text_by_tokens(text)
+    return {
+        "chunk_text_by_chars": lambda: app.chunk_text_by_chars(text),
+        "tokenize": lambda: registry.get("tokenizer")(sentences, add_special_tokens=False),
+        "chunk_text_by_tokens": lambda: app.chunk_text_by_tokens(text),
+        "safe_summarize": lambda: app.safe_summarize(chunks[0]),
+        "summarize_chunks": lambda: app.summarize_chunks(chunks),
+        "extract_unique_actions": lambda: app.extract_unique_actions(text),
+        "get_action_items": lambda: sap.get_action_items(text),
+        "aget_action_items": lambda: asyncio.run(sap.aget_action_items(text, requests_per_minute=0)),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(models="stub", repeat=3, sizes=SYNTHETIC_SIZES, stages=None):
+    if models == "stub":
+        use_stub_models()
+    sap.client = SimpleNamespace(chat=SimpleNamespace(completions=StubCompletions()))
+    sap.AsyncOpenAI = StubAsyncOpenAI
+    # every run must do the work, not read it back from an earlier one
+    cache.enabled = False
+
+    transcript = TRANSCRIPT_PATH.read_text(encoding="utf-8")
+    inputs = [("meeting-2", transcript)] + [
+        (f"synthetic-{size}", synthetic_transcript(size, seed=size)) for size in sizes]
+
+    registry.warm("tokenizer", "summarizer", "action_extractor")
+    results = []
+    for name, text in inputs:
+        for stage_name, func in pipeline_stages(text).items():
+            if stages and stage_name not in stages:
+                continue
+            # silence the pipeline's progress prints
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                result = measure(func, repeat)
+            results.append(dict(stage=stage_name, input=name, input_chars=len(text), **result))
+            print(f"{name:>18} {stage_name:<24} {result['seconds_median'] * 1000:10.1f} ms", file=sys.stderr)
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "models": models,
+        "repeat": repeat,
+        "model_stats": registry.stats(),
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the meeting pipeline")
+    parser.add_argument("--models", choices=("stub", "real"), default="stub")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(SYNTHETIC_SIZES),
+                        help="characters in each synthetic transcript")
+    parser.add_argument("--stage", action="append", dest="stages", help="only run these stages")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args.models, args.repeat, args.sizes, args.stages)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
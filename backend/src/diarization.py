@@ -0,0 +1,114 @@
+import os
+
+import numpy as np
+
+from model_registry import registry
+
+SAMPLE_RATE = 16000
+PYANNOTE_MODEL = "pyannote/speaker-diarization-3.1"
+# Segments shorter than this give unreliable voice embeddings
+MIN_EMBED_SECONDS = 0.5
+
+
+def _load_pyannote():
+    import torch
+    from pyannote.audio import Pipeline
+    pipeline = Pipeline.from_pretrained(PYANNOTE_MODEL,
+                                        use_auth_token=os.getenv("HF_TOKEN") or os.getenv("HUGGINGFACE_TOKEN"))
+    if torch.cuda.is_available():
+        pipeline.to(torch.device("cuda"))
+    return pipeline
+
+
+def _load_voice_encoder():
+    from resemblyzer import VoiceEncoder
+    return VoiceEncoder("cpu", verbose=False)
+
+
+registry.register("diarization", _load_pyannote)
+registry.register("voice_encoder", _load_voice_encoder)
+
+
+def diarize_pyannote(audio, num_speakers=None):
+    """Speaker turns as (start, end, speaker) tuples from the pyannote pipeline."""
+    import torch
+    pipeline = registry.get("diarization")
+    waveform = torch.from_numpy(audio).unsqueeze(0)
+    annotation = pipeline({"waveform": waveform, "sample_rate": SAMPLE_RATE}, num_speakers=num_speakers)
+    return [(turn.start, turn.end, speaker) for turn, _, speaker in annotation.itertracks(yield_label=True)]
+
+
+def diarize_embeddings(audio, segments, num_speakers=None, distance_threshold=0.7):
+    """Speaker turns from clustering a resemblyzer voice embedding per Whisper segment.
+
+    A CPU-only fallback for pyannote. Each segment long enough to embed is
+    clustered by cosine distance; shorter segments are left to assign_speakers,
+    which gives them the speaker of the nearest turn.
+    """
+    from resemblyzer import preprocess_wav
+    from sklearn.cluster import AgglomerativeClustering
+
+    encoder = registry.get("voice_encoder")
+    embedded, embeddings = [], []
+    for segment in segments:
+        if segment['end'] - segment['start'] < MIN_EMBED_SECONDS:
+            continue
+        wav = preprocess_wav(audio[int(segment['start'] * SAMPLE_RATE):int(segment['end'] * SAMPLE_RATE)])
+        if len(wav) < MIN_EMBED_SECONDS * SAMPLE_RATE:
+            continue  # mostly silence
+        embedded.append(segment)
+        embeddings.append(encoder.embed_utterance(wav))
+
+    if not embedded:
+        return []
+    if len(embedded) == 1:
+        labels = np.zeros(1, dtype=int)
+    else:
+        # there cannot be more clusters than embedded segments
+        clustering = AgglomerativeClustering(
+            n_clusters=min(num_speakers, len(embedded)) if num_speakers else None,
+            distance_threshold=None if num_speakers else distance_threshold,
+            metric="cosine", linkage="average")
+        labels = clustering.fit_predict(np.vstack(embeddings))
+
+    # number speakers in order of first appearance
+    first_seen = {}
+    for label in labels:
+        first_seen.setdefault(label, len(first_seen))
+    return [(s['start'], s['end'], f"SPEAKER_{first_seen[label]:02d}") for s, label in zip(embedded, labels)]
+
+
+def assign_speakers(segments, turns):
+    """Copy of the Whisper segments with a 'speaker' key from the turn overlapping each most.
+
+    Segments that overlap no turn get the speaker of the turn closest in time.
+    """
+    if not segments:
+        return []
+    if not turns:
+        return [dict(segment, speaker="SPEAKER_00") for segment in segments]
+
+    seg_start = np.array([s['start'] for s in segments])[:, None]
+    seg_end = np.array([s['end'] for s in segments])[:, None]
+    turn_start = np.array([t[0] for t in turns])[None, :]
+    turn_end = np.array([t[1] for t in turns])[None, :]
+
+    overlap = np.clip(np.minimum(seg_end, turn_end) - np.maximum(seg_start, turn_start), 0, None)
+    gap = np.abs((seg_start + seg_end) / 2 - (turn_start + turn_end) / 2)
+    best = np.where(overlap.max(axis=1) > 0, overlap.argmax(axis=1), gap.argmin(axis=1))
+
+    return [dict(segment, speaker=turns[i][2]) for segment, i in zip(segments, best)]
+
+
+def format_speaker_transcript(segments):
+    """Transcript with one line per speaker turn, e.g. '[01:05] SPEAKER_00: ...'."""
+    lines, speaker, texts, start = [], None, [], 0.0
+    for segment in segments:
+        if segment['speaker'] != speaker:
+            if texts:
+                lines.append(f"[{int(start // 60):02d}:{int(start % 60):02d}] {speaker}: {' '.join(texts)}")
+            speaker, texts, start = segment['speaker'], [], segment['start']
+        texts.append(segment['text'].strip())
+    if texts:
+        lines.append(f"[{int(start // 60):02d}:{int(start % 60):02d}] {speaker}: {' '.join(texts)}")
+    return "\n".join(lines)
@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def _rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _parameter_bytes(obj):
+    """Size of the torch weights behind a model or pipeline, if any."""
+    module = getattr(obj, "model", obj)
+    parameters = getattr(module, "parameters", None)
+    if not callable(parameters):
+        return None
+    try:
+        return sum(p.numel() * p.element_size() for p in parameters())
+    except Exception:
+        return None
+
+
+class ModelRegistry:
+    """Loads models on first use and keeps them for the life of the process.
+
+    Loaders are registered by name and only called when the model is first
+    requested. At most ``max_models`` stay resident (least recently used are
+    dropped first) and models unused for ``idle_timeout`` seconds are dropped
+    by a background sweep. Either limit can be disabled with ``None``.
+
+    Loads happen under a per-model lock, so a slow load never blocks threads
+    asking for a model that is already resident.
+    """
+
+    def __init__(self, max_models=None, idle_timeout=None):
+        self.max_models = max_models
+        self.idle_timeout = idle_timeout
+        self._loaders = {}
+        self._models = OrderedDict()
+        self._last_used = {}
+        self._stats = {}
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        if idle_timeout is not None:
+            self._start_idle_sweep()
+
+    def register(self, name, loader):
+        with self._lock:
+            self._loaders[name] = loader
+            self.evict(name)
+
+    def get(self, name):
+        model = self._get_loaded(name)
+        if model is not None:
+            return model
+
+        # only callers of this model wait for its load
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.RLock())
+        with load_lock:
+            model = self._get_loaded(name)
+            if model is not None:
+                return model
+            model = self._load(name)
+            with self._lock:
+                self._models[name] = model
+                self._last_used[name] = time.monotonic()
+                self._evict_lru()
+            return model
+
+    def _get_loaded(self, name):
+        with self._lock:
+            if name not in self._loaders:
+                raise KeyError(f"No model registered under '{name}'")
+            if name not in self._models:
+                return None
+            self._models.move_to_end(name)
+            self._last_used[name] = time.monotonic()
+            return self._models[name]
+
+    def warm(self, *names):
+        """Load the given models (all registered ones if none given) up front."""
+        for name in names or list(self._loaders):
+            self.get(name)
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def evict(self, name):
+        with self._lock:
+            self._models.pop(name, None)
+            self._last_used.pop(name, None)
+
+    def evict_idle(self):
+        if self.idle_timeout is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for name, used in list(self._last_used.items()):
+                if now - used > self.idle_timeout:
+                    print(f"Evicting idle model '{name}'")
+                    self.evict(name)
+
+    def _start_idle_sweep(self):
+        interval = max(1.0, self.idle_timeout / 2)
+
+        def sweep():
+            while True:
+                time.sleep(interval)
+                self.evict_idle()
+
+        threading.Thread(target=sweep, name="model-registry-idle-sweep", daemon=True).start()
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._last_used.clear()
+
+    def stats(self):
+        """Load time and memory for every model loaded so far."""
+        with self._lock:
+            return {
+                name: dict(stat, loaded=name in self._models)
+                for name, stat in self._stats.items()
+            }
+
+    def _load(self, name):
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        model = self._loaders[name]()
+        load_seconds = time.perf_counter() - start
+        rss_after = _rss_bytes()
+
+        with self._lock:
+            stat = self._stats.setdefault(name, {"loads": 0})
+            stat["loads"] += 1
+            stat["load_seconds"] = round(load_seconds, 3)
+            stat["parameter_bytes"] = _parameter_bytes(model)
+            # includes anything other threads allocated meanwhile
+            stat["rss_delta_bytes"] = (
+                rss_after - rss_before if rss_before is not None and rss_after is not None else None
+            )
+        print(f"Loaded model '{name}' in {load_seconds:.2f}s")
+        return model
+
+    def _evict_lru(self):
+        if self.max_models is None:
+            return
+        while len(self._models) > self.max_models:
+            name, _ = self._models.popitem(last=False)
+            self._last_used.pop(name, None)
+            print(f"Evicting least recently used model '{name}'")
+
+
+def _env_number(name, cast):
+    value = os.getenv(name)
+    return cast(value) if value else None
+
+
+registry = ModelRegistry(
+    max_models=_env_number("MODEL_REGISTRY_MAX_MODELS", int),
+    idle_timeout=_env_number("MODEL_REGISTRY_IDLE_SECONDS", float),
+)
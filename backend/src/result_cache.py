@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+_MISSING = object()
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_text(text):
+    return hash_bytes(text.encode("utf-8"))
+
+
+def hash_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_key(namespace, content_hash, model, params=None):
+    """Cache key for a result derived from some content by a model with the given parameters."""
+    payload = json.dumps([namespace, content_hash, model, params or {}], sort_keys=True)
+    return hash_text(payload)
+
+
+def _to_builtin(value):
+    # numpy scalars and arrays that end up in Whisper segments
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+class ResultCache:
+    """Size-bounded on-disk cache of JSON-serializable results.
+
+    Entries live in a single SQLite database so several worker processes can
+    share it; SQLite's locking serializes writers. When the stored values
+    exceed ``max_bytes`` the least recently used entries are evicted until
+    they fit in ``low_water`` of it, so eviction runs once per batch of writes
+    rather than on every write at the cap. The stored size and the hit and
+    miss counters are kept in the database, so they cover every process
+    using the same cache.
+    """
+
+    low_water = 0.9
+
+    def __init__(self, path, max_bytes, enabled=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._local = threading.local()
+
+    def _connection(self):
+        # SQLite connections must not cross threads or forked processes
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+        # running total of entries.size, so writes never have to sum the table
+        conn.execute("INSERT OR IGNORE INTO counters SELECT 'bytes', COALESCE(SUM(size), 0) FROM entries")
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key, default=None):
+        if not self.enabled:
+            return default
+        conn = self._connection()
+        with conn:
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'misses'")
+                return default
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'hits'")
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        data = json.dumps(value, default=_to_builtin)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (key, data, size, time.time()))
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'bytes'",
+                         (size - (row[0] if row else 0),))
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * self.low_water)
+        # walk the last_access index only as far as needed
+        keys, freed = [], 0
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", keys)
+        conn.execute("UPDATE counters SET value = value - ? WHERE name = 'bytes'", (freed,))
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def stats(self):
+        conn = self._connection()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"hits": counters["hits"], "misses": counters["misses"],
+                "entries": entries, "bytes": counters["bytes"], "max_bytes": self.max_bytes}
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("UPDATE counters SET value = 0")
+
+
+cache = ResultCache(
+    path=os.path.join(os.getenv("MEETING_CACHE_DIR", os.path.expanduser("~/.cache/meeting-summary")), "results.sqlite"),
+    max_bytes=int(float(os.getenv("MEETING_CACHE_MAX_MB", "1024")) * 1024 * 1024),
+    enabled=os.getenv("MEETING_CACHE_DISABLED", "") not in ("1", "true", "yes"),
+)
@@ -1,13 +1,57 @@
+import asyncio
+import functools
+import json
 import os
+import random
+import re
+import threading
 
 import openai
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+
+from result_cache import cache, hash_text, make_key
+from tracing import traced
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+MODEL = "gpt-4o-mini"
+SYSTEM_PROMPT = "You are an assistant that extracts action points from meeting transcripts."
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+REQUESTS_PER_MINUTE = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "60"))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+# Transcript tokens sent per request in map-reduce mode
+PIECE_TOKENS = int(os.getenv("OPENAI_PIECE_TOKENS", "6000"))
+
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES)
+
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+MAP_PROMPT = """
+Extract the action points from this part of a meeting transcript.
+
+Transcript ({position}){labeled}:
+\"\"\"
+{transcript}
+\"\"\"
+Respond with a JSON object of the form:
+{{"summary": "<short summary of this part>",
+  "action_items": [{{"task": "<what needs to be done>", "owner": "<who is responsible or null>",
+                    "due": "<due date or null>", "said_by": "<speaker who raised it or null>"}}]}}
+"""
+
+REDUCE_PROMPT = """
+These are summaries of consecutive parts of one meeting, in order.
+Write a single summary of the whole meeting from them.
+
+{summaries}
+"""
 
-def get_action_items(transcript):
+
+@traced()
+def get_action_items(transcript, speaker_labeled=False):
+    speakers = ("- use the speaker labels in the transcript for who is responsible and who said what"
+                if speaker_labeled else "- add who said what like speaker name and his speach")
     prompt = f"""
     You are an assistant that extracts action points from meeting transcripts.
     
@@ -19,16 +63,277 @@ def get_action_items(transcript):
         - What needs to be done
         - Who is responsible
         - Any due dates etc
-    - add who said what like speaker name and his speach
+    {speakers}
+    """
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    key = make_key("chat", hash_text(prompt), MODEL, {"system": SYSTEM_PROMPT, "temperature": 0.3})
+
+    def complete():
+        response = client.chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=0.3,
+        )
+        return response.choices[0].message.content
+
+    return cache.get_or_compute(key, complete)
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # the BPE file is downloaded on first use, which fails on offline workers
+        print(f"Warning: could not load tiktoken encoding ({e}); estimating token counts from length")
+        return None
+
+
+def count_tokens(text):
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1  # rough average for English text, used only without tiktoken
+    return len(encoding.encode(text))
+
+
+def _token_windows(text, max_tokens):
+    """Cut text into consecutive pieces of at most max_tokens each."""
+    encoding = _encoding()
+    if encoding is None:
+        width = max(1, (max_tokens - 1) * 4)  # inverse of the count_tokens estimate
+        return [text[i:i + width] for i in range(0, len(text), width)]
+    ids = encoding.encode(text)
+    return [encoding.decode(ids[i:i + max_tokens]) for i in range(0, len(ids), max_tokens)]
+
+
+def split_transcript(transcript, max_tokens=PIECE_TOKENS):
+    """Split a transcript on sentence or line boundaries into pieces of at most max_tokens.
+
+    A sentence longer than max_tokens on its own (e.g. an unpunctuated
+    transcript) is cut into token windows.
+    """
+    # keep the separators so speaker-labeled transcripts stay one turn per line
+    parts = re.split(r'((?<=[.?!])\s+|\n+)', transcript)
+    pieces, current, current_len = [], [], 0
+    for sentence, separator in zip(parts[0::2], parts[1::2] + [""]):
+        if not sentence.strip():
+            continue
+        length = count_tokens(sentence)
+        if length > max_tokens:
+            if current:
+                pieces.append("".join(current).strip())
+                current, current_len = [], 0
+            pieces.extend(window.strip() for window in _token_windows(sentence, max_tokens) if window.strip())
+            continue
+        if current and current_len + length > max_tokens:
+            pieces.append("".join(current).strip())
+            current, current_len = [], 0
+        current.append(sentence + separator)
+        current_len += length
+    if current:
+        pieces.append("".join(current).strip())
+    return pieces
+
+
+class RateLimiter:
+    """Spaces request starts so no more than requests_per_minute are sent."""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+async def _complete(aclient, messages, semaphore, limiter, max_retries, **kwargs):
+    key = make_key("chat", hash_text(json.dumps(messages)), MODEL, dict(kwargs, temperature=0.3))
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    for attempt in range(max_retries + 1):
+        async with semaphore:
+            await limiter.wait()
+            try:
+                response = await aclient.chat.completions.create(
+                    model=MODEL, messages=messages, temperature=0.3, **kwargs)
+                content = response.choices[0].message.content
+                cache.set(key, content)
+                return content
+            except RETRYABLE_ERRORS as e:
+                if attempt == max_retries:
+                    raise
+                delay = min(60.0, 2.0 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"Warning: request failed on attempt {attempt + 1}/{max_retries + 1} with error: {e}; "
+                      f"retrying in {delay:.1f}s")
+        # back off outside the semaphore so other pieces can proceed
+        await asyncio.sleep(delay)
+
+
+def _parse_partial(content):
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        data = None
+    if not isinstance(data, dict):
+        # not the requested object; keep the text as this piece's summary
+        return {"summary": content or "", "action_items": []}
+    items = data.get("action_items")
+    items = [item for item in items if isinstance(item, dict) and isinstance(item.get("task"), str)
+             and item["task"].strip()] if isinstance(items, list) else []
+    summary = data.get("summary")
+    return {"summary": summary if isinstance(summary, str) else "", "action_items": items}
+
+
+def _normalize(task):
+    return " ".join(re.sub(r"[^\w\s]", " ", task.lower()).split())
+
+
+def merge_action_items(partials):
+    """Merge action items from all pieces in order, dropping repeats of the same task."""
+    merged = {}
+    for partial in partials:
+        for item in partial["action_items"]:
+            existing = merged.setdefault(_normalize(item["task"]), dict(item))
+            for field in ("owner", "due", "said_by"):
+                if not existing.get(field) and item.get(field):
+                    existing[field] = item[field]
+    return list(merged.values())
+
+
+def format_action_items(summary, items):
+    lines = ["Summary:", summary.strip(), "", "Action points:"]
+    for item in items:
+        details = [f"{label}: {item[field]}" for field, label in
+                   (("owner", "Owner"), ("due", "Due"), ("said_by", "Raised by")) if item.get(field)]
+        lines.append(f"- {item['task']}" + (f" ({', '.join(details)})" if details else ""))
+    return "\n".join(lines)
+
+
+async def _map_piece(aclient, piece, position, semaphore, limiter, max_retries, speaker_labeled=False):
+    content = await _complete(
+        aclient, [{"role": "system", "content": SYSTEM_PROMPT},
+                  {"role": "user", "content": MAP_PROMPT.format(
+                      position=position, transcript=piece,
+                      labeled=", one line per labeled speaker turn" if speaker_labeled else "")}],
+        semaphore, limiter, max_retries, response_format={"type": "json_object"})
+    return _parse_partial(content)
+
+
+async def _reduce(aclient, partials, semaphore, limiter, max_retries):
+    summaries = [partial["summary"] for partial in partials if partial["summary"]]
+    if len(summaries) > 1:
+        summary = await _complete(
+            aclient, [{"role": "system", "content": SYSTEM_PROMPT},
+                      {"role": "user", "content": REDUCE_PROMPT.format(summaries="\n\n".join(summaries))}],
+            semaphore, limiter, max_retries)
+    else:
+        summary = summaries[0] if summaries else ""
+    return format_action_items(summary, merge_action_items(partials))
+
+
+@traced()
+async def aget_action_items(transcript, max_concurrency=MAX_CONCURRENCY, requests_per_minute=REQUESTS_PER_MINUTE,
+                            piece_tokens=PIECE_TOKENS, max_retries=MAX_RETRIES, base_url=None,
+                            speaker_labeled=False):
+    """Extract action points from a transcript of any length.
+
+    The transcript is split into token-bounded pieces that are sent
+    concurrently over one pooled client (map), then the partial action lists
+    are merged and deduplicated and the partial summaries combined (reduce).
+    base_url points the client at any OpenAI-compatible server. With
+    speaker_labeled the model is told to take speakers from the transcript's
+    labels instead of inferring them.
     """
+    pieces = split_transcript(transcript, piece_tokens)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limiter = RateLimiter(requests_per_minute)
+
+    async with AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=base_url,
+                           timeout=REQUEST_TIMEOUT, max_retries=0) as aclient:
+        partials = await asyncio.gather(*[
+            _map_piece(aclient, piece, f"part {idx + 1} of {len(pieces)}", semaphore, limiter, max_retries,
+                       speaker_labeled)
+            for idx, piece in enumerate(pieces)
+        ])
+        return await _reduce(aclient, partials, semaphore, limiter, max_retries)
+
+
+class ActionItemStream:
+    """Map-reduce action extraction over a transcript that is still being produced.
+
+    Text passed to feed() is cut into pieces of piece_tokens as soon as a full
+    piece has arrived, and each piece is sent right away from an event loop in
+    a background thread. close() sends the rest, waits for every piece and
+    returns the merged output in the same format as aget_action_items.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, requests_per_minute=REQUESTS_PER_MINUTE,
+                 piece_tokens=PIECE_TOKENS, max_retries=MAX_RETRIES, base_url=None):
+        self.piece_tokens = piece_tokens
+        self.max_retries = max_retries
+        self._text, self._tokens, self._requests = "", 0, []
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._limiter = RateLimiter(requests_per_minute)
+        self._aclient = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=base_url,
+                                    timeout=REQUEST_TIMEOUT, max_retries=0)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def _send(self, piece):
+        self._requests.append(self._run(_map_piece(
+            self._aclient, piece, f"part {len(self._requests) + 1}", self._semaphore, self._limiter,
+            self.max_retries)))
+
+    def feed(self, text):
+        self._text += text
+        self._tokens += count_tokens(text)
+        if self._tokens <= self.piece_tokens:
+            return
+        pieces = split_transcript(self._text, self.piece_tokens)
+        # every piece but the last is complete; the last keeps growing
+        for piece in pieces[:-1]:
+            self._send(piece)
+        if pieces:
+            self._text = pieces[-1] + self._text[len(self._text.rstrip()):]
+            self._tokens = count_tokens(self._text)
+
+    def close(self):
+        try:
+            for piece in split_transcript(self._text, self.piece_tokens):
+                self._send(piece)
+            self._text, self._tokens = "", 0
+            partials = [request.result() for request in self._requests]
+            return self._run(_reduce(self._aclient, partials, self._semaphore, self._limiter,
+                                     self.max_retries)).result()
+        finally:
+            self._run(self._aclient.close()).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are an assistant that extracts action points from meeting transcripts."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.3,
-    )
 
-    return (response.choices[0].message.content)
+def get_action_items_map_reduce(transcript, **kwargs):
+    return asyncio.run(aget_action_items(transcript, **kwargs))
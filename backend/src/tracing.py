@@ -0,0 +1,79 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_hooks = []
+
+
+def add_hook(hook):
+    """Call hook(stage_name, seconds) whenever a traced stage finishes."""
+    _hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+@contextmanager
+def stage(name):
+    if not _hooks:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for hook in list(_hooks):
+            hook(name, elapsed)
+
+
+def traced(name=None):
+    """Decorator that records each call of a function, sync or async, as a stage."""
+    def decorate(func):
+        stage_name = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage(stage_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def log_hook(name, seconds):
+    print(f"[trace] {name}: {seconds * 1000:.1f} ms")
+
+
+class StageStats:
+    """Hook that aggregates call count and total/max latency per stage."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, name, seconds):
+        with self._lock:
+            stat = self._stats.setdefault(name, {"calls": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stat["calls"] += 1
+            stat["total_seconds"] += seconds
+            stat["max_seconds"] = max(stat["max_seconds"], seconds)
+
+    def summary(self):
+        with self._lock:
+            return {name: dict(stat) for name, stat in self._stats.items()}
+
+
+if os.getenv("MEETING_TRACE", "") in ("1", "true", "yes"):
+    add_hook(log_hook)
@@ -0,0 +1,61 @@
+import os
+import sys
+import unittest
+from pathlib import Path
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["MEETING_CACHE_DISABLED"] = "1"
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import app
+
+SAME = [
+    ("Mark will send the budget report by Friday.", "Mark will send the budget report by Friday"),
+    ("Mark will send the budget report by Friday.", "mark will send the budget reports by friday."),
+    ("Team must review slides", "The team must review the slides."),
+    ("Sarah will schedule the audit meeting next week.", "Sarah will schedule the audit meeting for next week"),
+    ("Dave to update the tax levy figures", "Dave will update the tax levy figures."),
+]
+
+DIFFERENT = [
+    ("Mark will send the budget report by Friday.", "Mark will review the budget report by Friday."),
+    ("Mark will send the budget report by Friday.", "Sarah will send the budget report by Friday."),
+    ("Mark will send the budget report by Friday.", "Mark will send the staffing plan by Friday."),
+    ("Dave will update the tax levy figures.", "Dave will approve the tax levy figures."),
+    ("Sarah will schedule the audit meeting next week.", "Sarah will schedule the budget meeting next week."),
+    ("Priya will circulate the staffing plan.", "Tom will circulate the staffing plan."),
+]
+
+
+def candidates(texts):
+    return [{"text": text, "chunk": idx, "start": float(idx)} for idx, text in enumerate(texts)]
+
+
+class DedupeActionsTest(unittest.TestCase):
+    def test_near_duplicates_merge(self):
+        for first, second in SAME:
+            merged = app.dedupe_actions(candidates([first, second]))
+            self.assertEqual([(m["text"], m["mentions"], m["start"]) for m in merged], [(first, 2, 0.0)],
+                             (first, second))
+
+    def test_different_tasks_stay_apart(self):
+        for first, second in DIFFERENT:
+            merged = app.dedupe_actions(candidates([first, second]))
+            self.assertEqual([m["text"] for m in merged], [first, second], (first, second))
+
+    def test_pairs_among_many_items(self):
+        texts = [text for pair in SAME + DIFFERENT for text in pair]
+        merged = {m["text"]: m["mentions"] for m in app.dedupe_actions(candidates(texts))}
+        # the first of each different pair may be a duplicate from SAME, the second never is
+        for first, second in DIFFERENT:
+            self.assertIn(second, merged)
+        for first, second in SAME:
+            self.assertNotIn(second, merged)
+
+    def test_stop_words_only(self):
+        merged = app.dedupe_actions(candidates(["Okay.", "okay", "Thanks."]))
+        self.assertEqual([m["text"] for m in merged], ["Okay.", "Thanks."])
+
+
+if __name__ == "__main__":
+    unittest.main()
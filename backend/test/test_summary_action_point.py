@@ -0,0 +1,150 @@
+import json
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["MEETING_CACHE_DISABLED"] = "1"
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import summary_action_point as sap
+
+TRANSCRIPT_PATH = Path(__file__).parent / "meeting-2_transcript.txt"
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible chat completions endpoint.
+
+    The first request fails with a 500 so the retry path is exercised. Map
+    requests answer with the same task in two spellings plus one task unique
+    to the request; reduce requests answer with plain text.
+    """
+
+    requests = []
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.lock:
+            self.requests.append(body)
+            number = len(self.requests)
+        if number == 1:
+            self._send(500, {"error": {"message": "stub failure", "type": "server_error"}})
+            return
+
+        prompt = body["messages"][-1]["content"]
+        if "JSON" in prompt:
+            content = json.dumps({
+                "summary": f"summary {number}",
+                "action_items": [
+                    {"task": "Send the budget report.", "owner": "Mark Miller", "due": None},
+                    {"task": "send the budget report", "owner": None, "due": "May 15th"},
+                    {"task": f"Follow up on item {number}", "owner": None, "due": None},
+                ],
+            })
+        else:
+            content = "combined summary"
+        self._send(200, {
+            "id": f"stub-{number}", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class SplitTranscriptTest(unittest.TestCase):
+    def test_pieces_stay_within_token_budget(self):
+        transcript = TRANSCRIPT_PATH.read_text(encoding="utf-8")
+        pieces = sap.split_transcript(transcript, 3000)
+        self.assertGreater(len(pieces), 1)
+        self.assertLessEqual(max(sap.count_tokens(piece) for piece in pieces), 3000)
+
+    def test_unpunctuated_transcript_is_split(self):
+        transcript = " ".join(f"word{i}" for i in range(50000))
+        pieces = sap.split_transcript(transcript, 3000)
+        self.assertGreater(len(pieces), 1)
+        self.assertLessEqual(max(sap.count_tokens(piece) for piece in pieces), 3000)
+        # windows may cut inside a word, but no text is lost or repeated
+        self.assertEqual("".join("".join(pieces).split()), "".join(transcript.split()))
+
+
+class ParsePartialTest(unittest.TestCase):
+    def test_malformed_replies_become_summary_only(self):
+        self.assertEqual(sap._parse_partial('[{"task": "x"}]'),
+                         {"summary": '[{"task": "x"}]', "action_items": []})
+        self.assertEqual(sap._parse_partial("not json")["action_items"], [])
+        partial = sap._parse_partial(json.dumps({
+            "summary": ["not", "text"],
+            "action_items": [{"task": 3}, {"task": ["a"]}, {"task": " "}, "loose", {"task": "Call Sam"}]}))
+        self.assertEqual(partial, {"summary": "", "action_items": [{"task": "Call Sam"}]})
+        self.assertEqual(sap._parse_partial('{"summary": "ok", "action_items": {"task": "x"}}'),
+                         {"summary": "ok", "action_items": []})
+        self.assertEqual(len(sap.merge_action_items([partial, partial])), 1)
+
+
+class MapReduceTest(unittest.TestCase):
+    def setUp(self):
+        StubOpenAIHandler.requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAIHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retries_merges_and_reduces(self):
+        transcript = TRANSCRIPT_PATH.read_text(encoding="utf-8")
+        pieces = sap.split_transcript(transcript, 2000)
+
+        output = sap.get_action_items_map_reduce(
+            transcript, piece_tokens=2000, requests_per_minute=6000, max_retries=2, base_url=self.base_url)
+
+        # one failed attempt, one request per piece, one reduce
+        self.assertEqual(len(StubOpenAIHandler.requests), len(pieces) + 2)
+        self.assertIn("combined summary", output)
+        # the duplicate task appears once, with owner and due date merged from both spellings
+        report_lines = [line for line in output.splitlines() if "budget report" in line.lower()]
+        self.assertEqual(report_lines, ["- Send the budget report. (Owner: Mark Miller, Due: May 15th)"])
+        self.assertEqual(sum(line.startswith("- Follow up on item") for line in output.splitlines()),
+                         len(pieces))
+        for request in StubOpenAIHandler.requests:
+            prompt = request["messages"][-1]["content"]
+            if "JSON" in prompt:
+                self.assertLessEqual(sap.count_tokens(prompt.split('"""')[1].strip()), 2000)
+
+    def test_stream_sends_pieces_while_fed(self):
+        transcript = TRANSCRIPT_PATH.read_text(encoding="utf-8")
+        stream = sap.ActionItemStream(piece_tokens=2000, requests_per_minute=6000, max_retries=2,
+                                      base_url=self.base_url)
+        words = transcript.split(" ")
+        half = len(words) // 2
+        stream.feed(" ".join(words[:half]))
+        # the first full pieces are sent before the rest of the transcript arrives
+        self.assertGreater(len(stream._requests), 0)
+        stream.feed(" " + " ".join(words[half:]))
+        output = stream.close()
+
+        pieces = sap.split_transcript(transcript, 2000)
+        self.assertEqual(len(StubOpenAIHandler.requests), len(pieces) + 2)
+        self.assertIn("combined summary", output)
+        report_lines = [line for line in output.splitlines() if "budget report" in line.lower()]
+        self.assertEqual(report_lines, ["- Send the budget report. (Owner: Mark Miller, Due: May 15th)"])
+
+
+if __name__ == "__main__":
+    unittest.main()